@@ -0,0 +1,59 @@
+# migrate.py
+# one-off schema setup for web-search.py; run it once per database (needs a
+# user with CREATE rights), reading the same secrets as the app:
+#
+#     python migrate.py
+#
+# the app itself issues no DDL, but it does write: it INSERTs new record
+# embeddings into objek_embeddings, so its DB user needs SELECT and INSERT
+# on that table (see the GRANT printed at the end). Without the index it is
+# slower; without a readable objek_embeddings it scores every neighbour in
+# Python
+import streamlit as st
+from sqlalchemy import create_engine, text
+
+GEOG_INDEX = "objek_penilaian_geog_spgist_nz"
+
+SCHEMA_DDL = (
+    # ST_DWithin in find_neighbour is only index-assisted when geog is indexed;
+    # SP-GiST is smaller and faster than GiST for point data, and the partial
+    # predicate matches find_neighbour's `longitude <> 0` so 0/0 rows stay out
+    f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {GEOG_INDEX} "
+    "ON objek_penilaian USING spgist (geog) WHERE longitude <> 0",
+    # embeddings of prospect / previous-assignment records, keyed by md5 of the
+    # embedded text so a record is only ever sent to the embeddings API once
+    "CREATE EXTENSION IF NOT EXISTS vector",
+    "CREATE TABLE IF NOT EXISTS objek_embeddings ("
+    " record_md5 text PRIMARY KEY,"
+    " embedding vector(1536) NOT NULL)",
+)
+
+INDEX_VALID_SQL = """
+SELECT i.indisvalid
+FROM pg_index i
+JOIN pg_class c ON c.oid = i.indexrelid
+WHERE c.relname = :name
+"""
+
+
+def main():
+    engine = create_engine(
+        f"postgresql+psycopg2://{st.secrets['DB_USER']}:{st.secrets['DB_PASSWORD']}"
+        f"@{st.secrets['DB_HOST']}:{st.secrets['DB_PORT']}/{st.secrets['DB_NAME']}"
+    )
+    # CONCURRENTLY cannot run inside a transaction block
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # a failed CONCURRENTLY build leaves an INVALID index behind, which
+        # IF NOT EXISTS would then skip forever: drop it so it is rebuilt
+        if conn.execute(text(INDEX_VALID_SQL), {"name": GEOG_INDEX}).scalar() is False:
+            print(f"rebuilding invalid index {GEOG_INDEX}")
+            conn.execute(text(f"DROP INDEX CONCURRENTLY {GEOG_INDEX}"))
+        for ddl in SCHEMA_DDL:
+            print(ddl)
+            conn.execute(text(ddl))
+    print("if the app connects as a different user, also run:\n"
+          "    GRANT SELECT, INSERT ON objek_embeddings TO <app_user>;")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,106 @@
 # app.py
 import streamlit as st
-from openai import AsyncOpenAI
-import googlemaps
-import os
 import pandas as pd
 import asyncio
-import geopandas as gpd
-from shapely.geometry import Point
-from sqlalchemy import create_engine
-import json
+import io
+import orjson
+import hashlib
+import numpy as np
+import threading
+import time
+import random
 from datetime import datetime
 
+# selectbox options: built once per process, not on every Streamlit rerun
+JENIS_OBJEK_OPTIONS: tuple[str, ...] = (
+    "Kios",
+    "Bisnis Unit",
+    "Kapal",
+    "Rumah Sakit",
+    "Unit Mesin",
+    "Rumah Tinggal",
+    "Pembangkit Listrik",
+    "Perkebunan Kelapa Sawit",
+    "Ruko",
+    "Perkebunan Hutan Tanaman Industri",
+    "Alat Berat",
+    "Stok Barang",
+    "Pabrik",
+    "Lainnya",
+    "Tanah dan Bangunan Sederhana",
+    "Pabrik Kelapa Sawit",
+    "Tanah Kosong",
+    "Pembangkit",
+    "Tangki Timbun (Bulking Station)",
+    "Gedung Kantor",
+    "Serviced Apartemen",
+    "Aset Tak Berwujud",
+    "Tower",
+    "SPBU",
+    "Tanah dan Bangunan Gudang atau Pabrik",
+    "Perkebunan Nanas & Komoditi Lain",
+    "Mesin dan Peralatan",
+    "Biogas",
+    "Saham",
+    "Villa",
+    "Perkebunan Hortikultur",
+    "Pendapat Kewajaran",
+    "Hotel",
+    "Soho",
+    "Entitas",
+    "Unit Kendaraan",
+    "Transaksi",
+    "Pipeline",
+    "Ruang Kantor",
+    "Kondominium",
+    "Mall",
+    "Perkebunan Kelapa Sawit Plasma",
+    "Bangunan Saja",
+)
+
+TUJUAN_PENILAIAN_OPTIONS: tuple[str, ...] = (
+    "Pelaporan Keuangan",
+    "Audit Support / Review",
+    "Asuransi",
+    "Investasi / Pendanaan",
+    "Akuisisi / Penggabungan Usaha / Divestasi",
+    "Jual Beli / Sewa Menyewa",
+    "Penghapusan Aset / Hibah / Lelang",
+    "IPO / Keterbukaan Informasi Publik",
+    "Penjaminan Utang",
+    "Pengadaan Tanah / Kompensasi",
+    "Kajian Nilai / Studi Kelayakan",
+    "Rencana Kerjasama / Internal Manajemen",
+    "Pemanfaatan Ruang / Kesesuaian Tata Ruang",
+)
+
+JENIS_TRANSAKSI_OPTIONS: tuple[str, ...] = (
+    "Monitoring",
+    "Advisory",
+    "Konsultansi",
+    "Penilaian Saham",
+    "Penilaian Aset",
+    "Others",
+)
+
+# loader / done banners for the submit handler, same reasoning as above
+LOADER_HTML = """
+<div style="text-align:center; margin-top:50px;">
+    <img src="https://media2.giphy.com/media/v1.Y2lkPTc5MGI3NjExd3c5MDZkZDU2cGNpeXNvYXljdnZkemVuMnBwNHI1aXB3cXBrangzdSZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/wrmVCNbpOyqgJ9zQTn/giphy.gif"
+        width="120" alt="Loading...">
+    <p style="font-size:18px;">Sedang menganalisis…</p>
+</div>
+"""
+
+SUCCESS_HTML = """
+<div style="text-align:center; margin-top:50px;">
+    <img src="https://media0.giphy.com/media/v1.Y2lkPTc5MGI3NjExaWZ4bWczbGY1a3l6bDRkZzl6Yjd0eTJ5bTQ0MDJ1cHE1Zjgxemo1MyZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/6nuiJjOOQBBn2/giphy.gif"
+        width="150" alt="Success!">
+    <p style="font-size:18px; color:#16a34a; font-weight:600;">Analisis selesai! Lihat tab <b>Hasil Analisis</b>.</p>
+</div>
+"""
+
+
 st.markdown(
     """
     <link href="https://fonts.googleapis.com/css2?family=Playfair+Display:wght@600&family=Open+Sans:wght@400;500&display=swap" rel="stylesheet">
@@ -30,8 +120,44 @@ st.markdown(
 # ----------------------------------------------------------
 # 1.  SECRETS  →  CLIENTS  →  ENGINE
 # ----------------------------------------------------------
+# Google Geocoding REST API awaited on the shared async HTTP pool, so a
+# geocode never blocks the event loop (googlemaps.Client is sync only)
+class Geocoder:
+    URL = "https://maps.googleapis.com/maps/api/geocode/json"
+    RETRIES = 3
+    # the shared pool's 600 s read timeout is sized for LLM calls, not for
+    # a geocode that should answer in well under a second
+    TIMEOUT = 10.0
+
+    def __init__(self, api_key, http_client):
+        self.api_key = api_key
+        self.http_client = http_client
+
+    async def geocode(self, addr: str) -> tuple[float, float]:
+        # errors come back as HTTP 200 with a status; like googlemaps.Client,
+        # OVER_QUERY_LIMIT is retried with backoff and anything else not OK
+        # (ZERO_RESULTS, REQUEST_DENIED, ...) is raised with that status
+        for attempt in range(self.RETRIES + 1):
+            r = await self.http_client.get(
+                self.URL, params={"address": addr, "key": self.api_key}, timeout=self.TIMEOUT
+            )
+            r.raise_for_status()
+            data = r.json()
+            status = data.get("status")
+            if status == "OK":
+                loc = data['results'][0]['geometry']['location']
+                return float(loc['lat']), float(loc['lng'])
+            if status != "OVER_QUERY_LIMIT" or attempt == self.RETRIES:
+                break
+            await asyncio.sleep(0.5 * 2 ** attempt + random.uniform(0, 0.5))
+        raise RuntimeError(f"{status}: {data.get('error_message') or addr}")
+
 @st.cache_resource
 def init_clients():
+    # heavy client libraries are imported on first use, not at module import
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    from sqlalchemy import create_engine
     try:
         openai_key = st.secrets["OPENAI_API_KEY"]
         google_key = st.secrets["GOOGLE_API_KEY"]
@@ -41,10 +167,25 @@ def init_clients():
         db_port = st.secrets["DB_PORT"]
         db_name = st.secrets["DB_NAME"]
 
-        gpt_async = AsyncOpenAI(api_key=openai_key)
-        gmaps     = googlemaps.Client(key=google_key)
+        # one pooled HTTP/2 client per worker: TLS is paid once and the
+        # concurrent calls in get_result multiplex over kept-alive sockets
+        http_client = DefaultAsyncHttpxClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+            # fail fast on connect, but web_search and gpt-5-mini reasoning calls
+            # routinely run past a minute, so reads keep the SDK's 600 s default
+            timeout=httpx.Timeout(600.0, connect=10.0),
+        )
+        # SDK retries 429/5xx with exponential backoff + jitter (honours retry-after)
+        gpt_async = AsyncOpenAI(api_key=openai_key, max_retries=5, http_client=http_client)
+        gmaps     = Geocoder(google_key, http_client)
+        # one warm connection, bursts up to 8 (one per concurrent submission)
         engine    = create_engine(
-            f"postgresql+psycopg2://{db_user}:{db_pwd}@{db_host}:{db_port}/{db_name}"
+            f"postgresql+psycopg2://{db_user}:{db_pwd}@{db_host}:{db_port}/{db_name}",
+            pool_size=1,
+            max_overflow=7,
+            # the warm connection can sit idle for hours between submissions
+            pool_pre_ping=True,
         )
         return gpt_async, gmaps, engine
     except Exception as e:
@@ -53,53 +194,212 @@ def init_clients():
 
 gpt_client_async, gmaps_client, engine = init_clients()
 
+# httpx connections and HTTP/2 locks belong to the event loop that opened
+# them, so instead of a fresh asyncio.run per submission every coroutine runs
+# on one long-lived loop in a daemon thread; the cached pool stays valid
+@st.cache_resource
+def get_event_loop():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="agentic-view-loop", daemon=True).start()
+    return loop
+
+def run_async(coro):
+    # blocks the script thread until the coroutine is done on the app loop
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+@st.cache_resource
+def has_vector_store(_engine):
+    # pgvector + objek_embeddings come from migrate.py and may be missing or
+    # unreadable (not run yet, owned by another user without a GRANT); the
+    # app then scores every neighbour in Python instead
+    from sqlalchemy import text
+    try:
+        with _engine.connect() as conn:
+            conn.execute(text("SELECT 1 FROM objek_embeddings LIMIT 1"))
+        return True
+    except Exception:
+        return False
+
+vector_store = has_vector_store(engine)
+
+# bump whenever objek_penilaian is reloaded so cached neighbour lists are dropped
+NEIGHBOUR_DATA_VERSION = 1
+
+@st.cache_data(ttl=3600, max_entries=512, show_spinner=False)
+def _cached_neighbour(_view, _user_emb, user_text, lat_r, lon_r, dist, pt, jo, yr, data_version):
+    # keyed on the prospect text; its embedding follows from it, so skip hashing it
+    return _view._sync_fetch(
+        {"lon": lon_r, "lat": lat_r, "dist": dist, "pt": pt, "jo": jo, "yr": yr,
+         "emb": orjson.dumps(_user_emb, option=orjson.OPT_SERIALIZE_NUMPY).decode()}
+    )
+
+# ----------------------------------------------------------
+# 2.  RATE LIMITER  +  LLM CACHE
+# ----------------------------------------------------------
+# per-minute request/token budget of one model; OpenAI's RPM/TPM limits
+# (and the x-ratelimit headers reporting them) are per model
+class _ModelBucket:
+    def __init__(self, requests_per_min, tokens_per_min):
+        self.requests_per_min = requests_per_min
+        self.tokens_per_min   = tokens_per_min
+        self.requests_this_minute = 0
+        self.tokens_this_minute   = 0
+        self.window_start = time.monotonic()
+
+    def reserve(self, tokens):
+        # 0 when the call fits in the current minute, else seconds until it does
+        now = time.monotonic()
+        if now - self.window_start >= 60:
+            self.window_start = now
+            self.requests_this_minute = 0
+            self.tokens_this_minute   = 0
+        over = (self.requests_this_minute + 1 > self.requests_per_min
+                or self.tokens_this_minute + tokens > self.tokens_per_min)
+        if over and self.requests_this_minute:
+            return 60 - (now - self.window_start)
+        self.requests_this_minute += 1
+        self.tokens_this_minute   += tokens
+        return 0
+
+
+# caps in-flight OpenAI calls and paces each model under its per-minute
+# budgets. AgenticView is shared by every session; all of them run on the
+# one app loop (run_async), so a single semaphore covers every in-flight call.
+class RateLimiter:
+    def __init__(self, max_concurrency=8, requests_per_min=500, tokens_per_min=200_000):
+        self.max_concurrency  = max_concurrency
+        # starting budgets until a response reports the model's real limits
+        self.requests_per_min = requests_per_min
+        self.tokens_per_min   = tokens_per_min
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._sem  = asyncio.Semaphore(max_concurrency)
+
+    def _bucket(self, model):
+        # caller holds the lock
+        if model not in self._buckets:
+            self._buckets[model] = _ModelBucket(self.requests_per_min, self.tokens_per_min)
+        return self._buckets[model]
+
+    def _reserve(self, model, tokens):
+        with self._lock:
+            return self._bucket(model).reserve(tokens)
+
+    def observe(self, model, headers):
+        # sync the model's budgets with what the API reports for it
+        try:
+            limit_r = int(headers["x-ratelimit-limit-requests"])
+            left_r  = int(headers["x-ratelimit-remaining-requests"])
+            limit_t = int(headers["x-ratelimit-limit-tokens"])
+            left_t  = int(headers["x-ratelimit-remaining-tokens"])
+        except (KeyError, ValueError):
+            return
+        with self._lock:
+            b = self._bucket(model)
+            b.requests_per_min = limit_r
+            b.tokens_per_min   = limit_t
+            b.requests_this_minute = max(b.requests_this_minute, limit_r - left_r)
+            b.tokens_this_minute   = max(b.tokens_this_minute, limit_t - left_t)
+
+    async def run(self, fn, tokens, **kwargs):
+        async with self._sem:
+            while (delay := self._reserve(kwargs["model"], tokens)) > 0:
+                await asyncio.sleep(delay)
+            return await fn(**kwargs)
+
+
+# exact-match cache for LLM answers, shared by every session; st.cache_data
+# cannot wrap coroutines, so this is a small thread-safe TTL dict instead
+class TTLCache:
+    def __init__(self, ttl=3600, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._data = {}     # key -> (expires_at, value), oldest first
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None or hit[0] < time.monotonic():
+                self._data.pop(key, None)
+                return None
+            return hit[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            while len(self._data) > self.max_entries:
+                self._data.pop(next(iter(self._data)))
+
 # ----------------------------------------------------------
-# 2.  AGENTIC VIEW  (100 % original logic)
+# 3.  AGENTIC VIEW  +  BATCH API
 # ----------------------------------------------------------
 class AgenticView:
-    def __init__(self, google_client, gpt_client_async, engine):
+    def __init__(self, google_client, gpt_client_async, engine, vector_store=True):
         self.google_client = google_client
         self.gpt_client_async = gpt_client_async
         self.engine = engine
-
-    # -------------  all your methods unchanged  --------------
-    def validate_locations(self, parameter: dict) -> dict:
+        self.vector_store = vector_store
+        self._neighbour_sql = self.NEIGHBOUR_SQL.format(
+            similarity="1 - (e.embedding <=> CAST(:emb AS vector))"
+                       if vector_store else "NULL::float8",
+            join="LEFT JOIN objek_embeddings e ON e.record_md5 = md5(d.record_text)"
+                 if vector_store else "",
+        )
+        self._limiter = RateLimiter()
+        self._llm_cache = TTLCache(ttl=3600)
+        # geocoding is a full Google round trip; the same address should pay it once
+        self._geo_cache = TTLCache(ttl=86400, max_entries=1024)
+
+    async def _create_response(self, **kwargs):
+        # ~4 chars per token is close enough for pacing
+        est_tokens = (len(kwargs.get("instructions") or "") + len(str(kwargs.get("input", "")))) // 4
+        raw = await self._limiter.run(self.gpt_client_async.responses.with_raw_response.create, est_tokens, **kwargs)
+        self._limiter.observe(kwargs["model"], raw.headers)
+        return raw.parse()
+
+    # -------------  pipeline steps  --------------
+    async def validate_locations(self, parameter: dict) -> dict:
         try:
             lon = float(parameter["longitude"])
             lat = float(parameter["latitude"])
         except Exception as e1:
             try:
-                alamat = parameter["alamat_lokasi"]
-                geocode_result = self.google_client.geocode(alamat)
-                lat = float(geocode_result[0]['geometry']['location']['lat'])
-                lon = float(geocode_result[0]['geometry']['location']['lng'])
+                # normalised so case/whitespace variants share one cache entry
+                alamat = " ".join(parameter["alamat_lokasi"].lower().split())
+                lat, lon = await self._geocode(alamat)
             except Exception as e2:
-                st.error(f"Gagal mendapatkan koordinat: {e2}")
-                return None
+                # runs on the app loop thread, so let the Tab 1 handler report it
+                raise RuntimeError(f"Gagal mendapatkan koordinat: {e2}") from e2
         parameter["longitude"] = lon
         parameter["latitude"]  = lat
         return parameter
 
-    async def create_gdf(self, parameter: dict) -> gpd.GeoDataFrame:
-        row = {
-            "longitude": parameter.get("longitude"),
-            "latitude": parameter.get("latitude"),
-            "jenis_objek": parameter.get("jenis_objek"),
-            "pemberi_tugas": parameter.get("pemberi_tugas"),
-            "nomor_kontrak": parameter.get("nomor_kontrak"),
-            "tahun": parameter.get("tahun"),
-            "luas_tanah": parameter.get("luas_tanah"),
-            "luas_bangunan": parameter.get("luas_bangunan"),
-            "tujuan_penilaian": parameter.get("tujuan_penilaian"),
-            "jenis_transaksi": parameter.get("jenis_transaksi"),
-            "alamat_lokasi": parameter.get("alamat_lokasi"),
-            "geometry": Point(parameter.get("longitude"), parameter.get("latitude")),
-        }
-        return gpd.GeoDataFrame([row], crs="EPSG:4326")
-
-    async def find_neighbour(self, distance_m, lon, lat):
-        sql = f"""
-        WITH q AS (SELECT ST_SetSRID(ST_MakePoint({lon}, {lat}), 4326)::geography AS pt)
+    async def _geocode(self, alamat):
+        if (cached := self._geo_cache.get(alamat)) is not None:
+            return cached
+        lat_lon = await self.google_client.geocode(alamat)
+        self._geo_cache.set(alamat, lat_lon)
+        return lat_lon
+
+    # prospect fields shown to the summary LLM (mirrors "Data Objek Prospek")
+    PROSPECT_FIELDS = (
+        "longitude", "latitude", "jenis_objek", "pemberi_tugas", "nomor_kontrak",
+        "tahun", "luas_tanah", "luas_bangunan", "tujuan_penilaian",
+        "jenis_transaksi", "alamat_lokasi",
+    )
+
+    # cheap "same object?" pre-filter, then the 20 nearest rows as before;
+    # cosine is pgvector's against the stored row embedding and NULL for rows
+    # never embedded (or without pgvector), filled in afterwards by
+    # _score_similarity, so it never decides which rows come back
+    NEIGHBOUR_SQL = """
+    WITH q AS (SELECT ST_SetSRID(ST_MakePoint(:lon, :lat), 4326)::geography AS pt)
+    SELECT
+        d.*,
+        {similarity} AS cosine
+    FROM (
         SELECT
             t.pemberi_tugas,
             t.jenis_objek_text,
@@ -111,75 +411,157 @@ class AgenticView:
             t.kepemilikan,
             t.dokumen_kepemilikan,
             t.tujuan_penugasan_text,
+            format('Pemberi tugas: %s, tahun: %s, jenis objek: %s, kepemilikan: %s, dokumen: %s, tujuan: %s',
+                   t.pemberi_tugas, t.tahun_kontrak, t.jenis_objek_text,
+                   t.kepemilikan, t.dokumen_kepemilikan, t.tujuan_penugasan_text) AS record_text,
             ST_Distance(t.geog, q.pt) AS distance_m
         FROM objek_penilaian t, q
-        WHERE ST_DWithin(t.geog, q.pt, {distance_m})
+        WHERE ST_DWithin(t.geog, q.pt, :dist)
           AND t.longitude <> 0
-          AND ST_Distance(t.geog, q.pt) > 0
-        ORDER BY distance_m
-        LIMIT 20;
-        """
-        return pd.read_sql(sql, self.engine)
-
-    async def _similarity_row(self, user_pemberi_tugas, user_tahun,
-                              user_kepemilikan, user_dokumen_kepemilikan,
-                              user_tujuan_penilaian, user_jenis_objek, row):
-        CERT = """
-        Dokumen kepemilikan levels (strongest → weakest):
-        1  Sertifikat Hak Milik (SHM) = full ownership
-        2  Sertifikat Hak Guna Bangunan (HGB) = right to build, upgradable to SHM
-        3  Sertifikat Hak Pakai (SHP) = right to use, time-limited
-        """
-        instruksi = (
-            f"{CERT}\n\n"
-            "Compare the two short land-valuation records and answer with the single line: x% "
-            "where x is an integer 0-100 expressing how likely these two records refer to the SAME object."
+          AND (t.pemberi_tugas ILIKE :pt ESCAPE '\\'
+               OR t.jenis_objek_text = :jo
+               OR abs(t.tahun_kontrak - :yr) <= 1)
+    ) d
+    {join}
+    WHERE d.distance_m > 0
+    ORDER BY d.distance_m
+    LIMIT 20;
+    """
+
+    async def find_neighbour(self, distance_m, lon, lat, parameter, user_emb):
+        # psycopg2 blocks, so run it in a worker thread and keep the loop free;
+        # coordinates are rounded to 5 dp (~1 m) so re-submissions hit the cache
+        return await asyncio.to_thread(
+            _cached_neighbour,
+            self,
+            user_emb,
+            self._user_record(parameter),
+            round(lat, 5),
+            round(lon, 5),
+            distance_m,
+            f"%{self._like_escape(parameter.get('pemberi_tugas') or '')}%",
+            parameter.get("jenis_objek"),
+            int(parameter.get("tahun") or 0),
+            NEIGHBOUR_DATA_VERSION,
+        )
+
+    @staticmethod
+    def _like_escape(value):
+        # a typed % or _ must match literally, not act as an ILIKE wildcard
+        return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+    def _sync_fetch(self, params):
+        from sqlalchemy import text
+        # plain dict rows: ~20 of them, no need for a DataFrame until the UI
+        with self.engine.connect() as conn:
+            return [dict(r) for r in conn.execute(text(self._neighbour_sql), params).mappings().all()]
+
+    EMBED_MODEL = "text-embedding-3-small"
+
+    def _user_record(self, parameter):
+        return (
+            f"Pemberi tugas: {parameter.get('pemberi_tugas', '')}, tahun: {parameter.get('tahun', 0)}, "
+            f"jenis objek: {parameter.get('jenis_objek', '')}, kepemilikan: {parameter.get('kepemilikan', '')}, "
+            f"dokumen: {parameter.get('dokumen_kepemilikan', '')}, tujuan: {parameter.get('tujuan_penilaian', '')}"
         )
-        user = f"Pemberi tugas: {user_pemberi_tugas}, tahun: {user_tahun}, jenis objek: {user_jenis_objek}, kepemilikan: {user_kepemilikan}, dokumen: {user_dokumen_kepemilikan}, tujuan: {user_tujuan_penilaian}"
-        db   = f"Pemberi tugas: {row['pemberi_tugas']}, tahun: {row['tahun_kontrak']}, jenis objek: {row['jenis_objek_text']}, kepemilikan: {row['kepemilikan']}, dokumen: {row['dokumen_kepemilikan']}, tujuan: {row['tujuan_penugasan_text']}"
-        resp = await self.gpt_client_async.responses.create(
-            model="gpt-5-mini",
-            instructions=instruksi,
-            input=f"User: {user}\nDatabase: {db}"
+
+    async def _embed(self, texts):
+        raw = await self._limiter.run(
+            self.gpt_client_async.embeddings.with_raw_response.create,
+            sum(len(t) for t in texts) // 4,
+            model=self.EMBED_MODEL,
+            input=texts
         )
-        return resp.output_text.strip().splitlines()[0]
-
-    async def _add_similarity_column(self, neighbour_df, parameter):
-        if neighbour_df.empty:
-            neighbour_df["similarity_pct"] = []
-            return neighbour_df
-
-        tasks = [
-            self._similarity_row(
-                parameter.get("pemberi_tugas", ""),
-                parameter.get("tahun", 0),
-                parameter.get("kepemilikan", ""),
-                parameter.get("dokumen_kepemilikan", ""),
-                parameter.get("tujuan_penilaian", ""),
-                parameter.get("jenis_objek", ""),
-                row
-            ) for _, row in neighbour_df.iterrows()
-        ]
-        neighbour_df["similarity_pct"] = await asyncio.gather(*tasks)
-        return neighbour_df
-
-    async def get_llm_response_of_object(self, df, gdf_from_params):
-        fetched = df.to_json(orient="records") if df is not None else None
-        prospect = gdf_from_params.to_dict(orient="records")
-        prompt = f"""
+        self._limiter.observe(self.EMBED_MODEL, raw.headers)
+        return np.asarray([d.embedding for d in raw.parse().data], dtype=np.float32)
+
+    def _load_embeddings(self, keys):
+        from sqlalchemy import text
+        if not self.vector_store:
+            return {}
+        # pgvector's text form "[0.1,0.2,...]" is valid JSON
+        try:
+            with self.engine.connect() as conn:
+                res = conn.execute(
+                    text("SELECT record_md5, embedding::text FROM objek_embeddings WHERE record_md5 = ANY(:keys)"),
+                    {"keys": keys}
+                )
+                return {k: np.asarray(orjson.loads(e), dtype=np.float32) for k, e in res}
+        except Exception:
+            return {}
+
+    def _store_embeddings(self, new):
+        from sqlalchemy import text
+        if not self.vector_store:
+            return
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    text("INSERT INTO objek_embeddings (record_md5, embedding) VALUES (:k, CAST(:e AS vector)) "
+                         "ON CONFLICT (record_md5) DO NOTHING"),
+                    [{"k": k, "e": orjson.dumps(v, option=orjson.OPT_SERIALIZE_NUMPY).decode()}
+                     for k, v in new.items()]
+                )
+        except Exception:
+            pass    # no write access: those rows just get embedded again next time
+
+    async def _get_embeddings(self, texts):
+        # objek_embeddings first, then one API request for whatever is missing
+        keys    = [hashlib.md5(t.encode()).hexdigest() for t in texts]
+        stored  = await asyncio.to_thread(self._load_embeddings, keys)
+        missing = {k: t for k, t in zip(keys, texts) if k not in stored}
+        if missing:
+            fresh = await self._embed(list(missing.values()))
+            new   = dict(zip(missing, fresh))
+            await asyncio.to_thread(self._store_embeddings, new)
+            stored.update(new)
+        return np.stack([stored[k] for k in keys])
+
+    # every record is the same "Pemberi tugas: …, tahun: …" template, so even
+    # unrelated pairs have a high raw cosine; similarity_pct rescales it so
+    # the prospect's cosine to the bare template is 0 (nothing in common
+    # beyond the field names) and a cosine of 1 is 100 (identical record)
+    TEMPLATE_RECORD = "Pemberi tugas: , tahun: , jenis objek: , kepemilikan: , dokumen: , tujuan: "
+    # a row has to close at least 30 % of the gap from template to identical
+    SIMILARITY_CUTOFF = 30
+
+    async def _score_similarity(self, rows, user_emb, template_emb):
+        # find_neighbour brings the cosine of every row it has an embedding
+        # for; the rest are embedded here (and stored, so next time SQL has them)
+        user_emb = user_emb / np.linalg.norm(user_emb)
+        todo = [r for r in rows if r["cosine"] is None]
+        if todo:
+            db_emb = await self._get_embeddings([r["record_text"] for r in todo])
+            # L2-normalise so one matmul gives the cosine similarity of every row
+            db_emb /= np.linalg.norm(db_emb, axis=1, keepdims=True)
+            for row, cos in zip(todo, db_emb @ user_emb):
+                row["cosine"] = float(cos)
+        floor = float(user_emb @ (template_emb / np.linalg.norm(template_emb)))
+        for row in rows:
+            row.pop("record_text", None)
+            pct = (row.pop("cosine") - floor) / max(1 - floor, 1e-6)
+            row["similarity_pct"] = int(round(100 * min(max(pct, 0.0), 1.0)))
+        return rows
+
+    SUMMARY_MODEL = "gpt-5-mini"
+
+    # static part of the summary prompt, built once and sent as `instructions`;
+    # only the prospect / previous-assignment data changes per call
+    OBJECT_INSTRUCTIONS = """
             You are an assistant tasked with assisting an assessment firm to:
             1. Prevent conflicts of interest
             2. Avoid duplication of work
             3. Avoid re-evaluating the same object
 
             **INFORMATIONS:** 
-            The following is data on new assignment prospects :
-            {prospect}
+            The input contains data on new assignment prospects and data on **previous assignments** performed by the firm, both as CSV with a header row.
 
-            And below is data on **previous assignments** performed by the firm :
-            {fetched}
+            Previous-assignment columns: pemberi_tugas (assignor), jenis_objek_text (object type), cabang_text (branch), divisi (division),
+            tahun_kontrak (contract year), alamat_lokasi (address, may be cut short), keterangan (notes), kepemilikan (ownership),
+            dokumen_kepemilikan (ownership document), tujuan_penugasan_text (assignment purpose), distance_m (distance to the prospect in meters).
 
-            The 'similarity_pct' column indicates the similarity level (0-100%) between a new object and one in the database.
+            The 'similarity_pct' column (0-100) scores how closely a previous assignment's assignor, year, object type, ownership, document and purpose
+            match the prospect's: 0 means nothing in common, 100 means the same values. It does not consider the address or the distance.
             Your task:
             - Compare each object in the new prospects list with the previous assignments list.
             - Identify any objects that are potentially **identical**, **similar**, or **conflicting**.
@@ -221,74 +603,172 @@ class AgenticView:
             - Do not mention or show the similarity_pct in any part of the output.
             - The output MUST using the template on 'RESPONSE PATTERNS'! DONT MAKE ANYTHING OTHER THAN THAT!
             """
-        
-        resp = await self.gpt_client_async.responses.create(model="gpt-5-mini", input=prompt)
+
+    # CSV instead of JSON: no per-row keys/quotes/braces, roughly half the
+    # prompt tokens; columns are explained once in OBJECT_INSTRUCTIONS
+    def build_object_prompt(self, rows, parameter):
+        fetched_df = pd.DataFrame(rows)
+        if not fetched_df.empty:
+            # similarity is already scored, the model only needs enough to recognise the address
+            fetched_df["alamat_lokasi"] = fetched_df["alamat_lokasi"].fillna("").str.slice(0, 100)
+        fetched = fetched_df.to_csv(index=False)
+        prospect = pd.DataFrame([{k: parameter.get(k) for k in self.PROSPECT_FIELDS}]).to_csv(index=False)
+        return (
+            f"The following is data on new assignment prospects :\n{prospect}\n\n"
+            f"And below is data on **previous assignments** performed by the firm :\n{fetched}"
+        )
+
+    async def get_llm_response_of_object(self, rows, parameter):
+        prompt = self.build_object_prompt(rows, parameter)
+        # same prospect + same neighbours -> same summary, skip the call
+        key = ("object", hashlib.md5(prompt.encode()).hexdigest())
+        if (cached := self._llm_cache.get(key)) is not None:
+            return cached
+        resp = await self._create_response(
+            model=self.SUMMARY_MODEL,
+            instructions=self.OBJECT_INSTRUCTIONS,
+            input=prompt
+        )
+        self._llm_cache.set(key, resp.output_text)
         return resp.output_text
 
     # ---- OPTIONAL news search (set DO_NEWS = False to disable) ----
     DO_NEWS = False   # <--- toggle off web search
 
-    async def get_llm_response_of_task_giver(self, task_giver: str) -> str:
-        if not self.DO_NEWS:
-            return "Aman!"          # skip news search completely
-        prompt = f"""
-            News about the '{task_giver}' case in Indonesia, create a list! 
+    NEWS_INSTRUCTIONS = """
             The case : corruption, scandal, or anything bad about the company.
             The output MUST in a list, and show ONLY the news and links (no need like 'Berikut adalah' or other, only show the list)!
             The company name MUST the same, DONT show other news! If you found no news about this company, just give this output : 'Aman!'
             NOTE : The company name MUST EXACTLY THE SAME and use Bahasa Indonesia.
             """
-        resp = await self.gpt_client_async.responses.create(
+
+    async def get_llm_response_of_task_giver(self, task_giver: str) -> str:
+        if not self.DO_NEWS:
+            return "Aman!"          # skip news search completely
+        # the same assignor shows up across many assignments
+        key = ("task_giver", " ".join(task_giver.casefold().split()))
+        if (cached := self._llm_cache.get(key)) is not None:
+            return cached
+        resp = await self._create_response(
             model="gpt-4.1-mini",
-            input=prompt,
+            instructions=self.NEWS_INSTRUCTIONS,
+            input=f"News about the '{task_giver}' case in Indonesia, create a list!",
             tools=[{"type": "web_search"}]
         )
+        self._llm_cache.set(key, resp.output_text)
         return resp.output_text
 
     async def _build_json_output(self, summary, client_sentiment):
         return {"summary": summary, "client_sentiment": client_sentiment}
 
     async def get_result(self, parameter):
-        parameter = self.validate_locations(parameter)
-        if parameter is None:
-            return None, None
-
-        gdf_from_params = await self.create_gdf(parameter)
-        neighbour = await self.find_neighbour(
-            10000,
-            float(parameter["longitude"]),
-            float(parameter["latitude"])
-        )
-        neighbour = await self._add_similarity_column(neighbour, parameter)
-
-        # keep only >= 30 % similarity
-        def pct_to_float(s):
-            try:
-                return float(str(s).replace("%", "").strip())
-            except:
-                return 0
-        neighbour["sim_num"] = neighbour["similarity_pct"].apply(pct_to_float)
-        neighbour = neighbour[neighbour["sim_num"] >= 30].sort_values("sim_num", ascending=False)
-        neighbour = neighbour.drop(columns=["sim_num"])
-
-        summary, sentiment = await asyncio.gather(
-            self.get_llm_response_of_object(neighbour, gdf_from_params),
+        # the news search needs only the assignor name: start it now so it
+        # overlaps geocoding, the DB query and the embeddings
+        sentiment_task = asyncio.create_task(
             self.get_llm_response_of_task_giver(parameter["pemberi_tugas"])
         )
-        return neighbour.drop(columns=["geometry"], errors="ignore"), \
+        # any failure below leaves nobody awaiting the news search: cancel it
+        # rather than let a billed web_search call run on unread
+        try:
+            parameter = await self.validate_locations(parameter)
+
+            user_emb, template_emb = await self._get_embeddings(
+                [self._user_record(parameter), self.TEMPLATE_RECORD]
+            )
+            neighbour = await self.find_neighbour(
+                10000,
+                float(parameter["longitude"]),
+                float(parameter["latitude"]),
+                parameter,
+                user_emb
+            )
+            neighbour = await self._score_similarity(neighbour, user_emb, template_emb)
+
+            neighbour = sorted((r for r in neighbour if r["similarity_pct"] >= self.SIMILARITY_CUTOFF),
+                               key=lambda r: r["similarity_pct"], reverse=True)
+
+            summary, sentiment = await asyncio.gather(
+                self.get_llm_response_of_object(neighbour, parameter),
+                sentiment_task
+            )
+        except BaseException:
+            sentiment_task.cancel()
+            raise
+        # DataFrame only for the Streamlit table / CSV download
+        return pd.DataFrame(neighbour), \
                await self._build_json_output(summary, sentiment)
 
+# OpenAI Batch API: half the price and a separate rate-limit pool, but results
+# can take up to 24h, so it is only used for non-interactive history re-runs;
+# get_result always stays on the live endpoint
+class BatchProcessor:
+    ACTIVE = ("validating", "in_progress", "finalizing", "cancelling")
+
+    def __init__(self, gpt_client_async, endpoint="/v1/responses"):
+        self.gpt_client_async = gpt_client_async
+        self.endpoint = endpoint
+
+    async def submit(self, bodies: dict) -> str:
+        # bodies: {custom_id: request body}, one JSONL line each
+        jsonl = b"\n".join(
+            orjson.dumps({"custom_id": cid, "method": "POST", "url": self.endpoint, "body": body})
+            for cid, body in bodies.items()
+        )
+        f = await self.gpt_client_async.files.create(file=("batch.jsonl", jsonl), purpose="batch")
+        batch = await self.gpt_client_async.batches.create(
+            input_file_id=f.id, endpoint=self.endpoint, completion_window="24h"
+        )
+        return batch.id
+
+    async def collect(self, batch_id: str):
+        # (status, None, 0) while still running, else
+        # (status, {custom_id: output text}, number of failed requests)
+        batch = await self.gpt_client_async.batches.retrieve(batch_id)
+        if batch.status in self.ACTIVE:
+            return batch.status, None, 0
+        # failed requests land in the error file or as non-200 output lines;
+        # when all of them fail the batch is still "completed", just without
+        # an output file
+        reported = batch.request_counts.failed if batch.request_counts else 0
+        failed = 0
+        if batch.error_file_id:
+            errors = await self.gpt_client_async.files.content(batch.error_file_id)
+            failed = len(errors.content.splitlines())
+        if batch.status != "completed" or not batch.output_file_id:
+            return batch.status, {}, max(failed, reported)
+        content = await self.gpt_client_async.files.content(batch.output_file_id)
+        results = {}
+        for line in content.content.splitlines():
+            item = orjson.loads(line)
+            response = item.get("response") or {}
+            if response.get("status_code") != 200:
+                failed += 1
+                continue
+            body = response.get("body") or {}
+            # raw /v1/responses JSON has no output_text shortcut; join message parts
+            results[item["custom_id"]] = "".join(
+                part.get("text", "")
+                for out in body.get("output", []) if out.get("type") == "message"
+                for part in out.get("content", []) if part.get("type") == "output_text"
+            )
+        return batch.status, results, max(failed, reported)
+
 # ----------------------------------------------------------
-# 3.  CACHE  AGENTIC-VIEW  INSTANCE
+# 4.  CACHE  AGENTIC-VIEW  INSTANCE
 # ----------------------------------------------------------
 @st.cache_resource
-def get_agentic_view(_gpt, _gmaps, _engine):
-    return AgenticView(_gmaps, _gpt, _engine)
+def get_agentic_view(_gpt, _gmaps, _engine, vector_store):
+    return AgenticView(_gmaps, _gpt, _engine, vector_store)
+
+@st.cache_resource
+def get_batch_processor(_gpt):
+    return BatchProcessor(_gpt)
 
-agentic_view = get_agentic_view(gpt_client_async, gmaps_client, engine)
+agentic_view = get_agentic_view(gpt_client_async, gmaps_client, engine, vector_store)
+batch_processor = get_batch_processor(gpt_client_async)
 
 # ----------------------------------------------------------
-# 4.  SESSION STATE
+# 5.  SESSION STATE
 # ----------------------------------------------------------
 if "result_ready"   not in st.session_state:
     st.session_state.result_ready   = False
@@ -298,9 +778,13 @@ if "json_result"    not in st.session_state:
     st.session_state.json_result    = None
 if "history"        not in st.session_state:
     st.session_state.history        = []
+if "history_batch"  not in st.session_state:
+    st.session_state.history_batch  = None
+if "batch_notice"   not in st.session_state:
+    st.session_state.batch_notice   = None
 
 # ----------------------------------------------------------
-# 5.  CSS  +  HEADER
+# 6.  CSS  +  HEADER
 # ----------------------------------------------------------
 st.markdown("""
 <style>
@@ -339,7 +823,7 @@ st.markdown(
 
 
 # ----------------------------------------------------------
-# 6.  TABS
+# 7.  TABS
 # ----------------------------------------------------------
 tab1, tab2, tab3 = st.tabs(["📝 Input Data", "📊 Hasil Analisis", "📜 Riwayat"])
 
@@ -348,76 +832,11 @@ with tab1:
     st.header("Input Data Penugasan Baru")
     c1, c2 = st.columns(2)
     with c1:
-        jenis_objek      = st.selectbox("Jenis Objek *", [
-                "Kios",
-                "Bisnis Unit",
-                "Kapal",
-                "Rumah Sakit",
-                "Unit Mesin",
-                "Rumah Tinggal",
-                "Pembangkit Listrik",
-                "Perkebunan Kelapa Sawit",
-                "Ruko",
-                "Perkebunan Hutan Tanaman Industri",
-                "Alat Berat",
-                "Stok Barang",
-                "Pabrik",
-                "Lainnya",
-                "Tanah dan Bangunan Sederhana",
-                "Pabrik Kelapa Sawit",
-                "Tanah Kosong",
-                "Pembangkit",
-                "Tangki Timbun (Bulking Station)",
-                "Gedung Kantor",
-                "Serviced Apartemen",
-                "Aset Tak Berwujud",
-                "Tower",
-                "SPBU",
-                "Tanah dan Bangunan Gudang atau Pabrik",
-                "Perkebunan Nanas & Komoditi Lain",
-                "Mesin dan Peralatan",
-                "Biogas",
-                "Saham",
-                "Villa",
-                "Perkebunan Hortikultur",
-                "Pendapat Kewajaran",
-                "Hotel",
-                "Soho",
-                "Entitas",
-                "Unit Kendaraan",
-                "Transaksi",
-                "Pipeline",
-                "Ruang Kantor",
-                "Kondominium",
-                "Mall",
-                "Perkebunan Kelapa Sawit Plasma",
-                "Bangunan Saja"
-            ])
+        jenis_objek      = st.selectbox("Jenis Objek *", JENIS_OBJEK_OPTIONS)
         pemberi_tugas    = st.text_input("Pemberi Tugas *", placeholder="Nama institusi/perusahaan yang memberikan tugas")
         tahun            = st.number_input("Tahun Kontrak *", min_value=2000, max_value=2100, value=datetime.now().year)
-        tujuan_penilaian = st.selectbox("Tujuan Penilaian *", [
-                "Pelaporan Keuangan",
-                "Audit Support / Review",
-                "Asuransi",
-                "Investasi / Pendanaan",
-                "Akuisisi / Penggabungan Usaha / Divestasi",
-                "Jual Beli / Sewa Menyewa",
-                "Penghapusan Aset / Hibah / Lelang",
-                "IPO / Keterbukaan Informasi Publik",
-                "Penjaminan Utang",
-                "Pengadaan Tanah / Kompensasi",
-                "Kajian Nilai / Studi Kelayakan",
-                "Rencana Kerjasama / Internal Manajemen",
-                "Pemanfaatan Ruang / Kesesuaian Tata Ruang"
-            ])
-        jenis_transaksi  = st.selectbox("Jenis Transaksi *", [
-                "Monitoring" , 
-                "Advisory" , 
-                "Konsultansi" , 
-                "Penilaian Saham" , 
-                "Penilaian Aset" , 
-                "Others"
-            ])
+        tujuan_penilaian = st.selectbox("Tujuan Penilaian *", TUJUAN_PENILAIAN_OPTIONS)
+        jenis_transaksi  = st.selectbox("Jenis Transaksi *", JENIS_TRANSAKSI_OPTIONS)
     with c2:
         alamat_lokasi = st.text_area("Alamat Lokasi *", placeholder="Masukkan alamat lengkap objek penilaian", height=100)
         lon_col, lat_col = st.columns(2)
@@ -459,19 +878,10 @@ with tab1:
             placeholder = st.empty()
 
             # show animated loader
-            placeholder.markdown(
-                """
-                <div style="text-align:center; margin-top:50px;">
-                    <img src="https://media2.giphy.com/media/v1.Y2lkPTc5MGI3NjExd3c5MDZkZDU2cGNpeXNvYXljdnZkemVuMnBwNHI1aXB3cXBrangzdSZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/wrmVCNbpOyqgJ9zQTn/giphy.gif" 
-                        width="120" alt="Loading...">
-                    <p style="font-size:18px;">Sedang menganalisis…</p>
-                </div>
-                """,
-                unsafe_allow_html=True
-            )
+            placeholder.markdown(LOADER_HTML, unsafe_allow_html=True)
 
             try:
-                n_df, js = asyncio.run(agentic_view.get_result(param))
+                n_df, js = run_async(agentic_view.get_result(param))
                 st.session_state.neighbour_df = n_df
                 st.session_state.json_result  = js
                 st.session_state.result_ready = True
@@ -480,20 +890,14 @@ with tab1:
                     "timestamp": datetime.now(),
                     "pemberi_tugas": pemberi_tugas,
                     "alamat": alamat_lokasi,
-                    "results": js
+                    "results": js,
+                    # kept so the history can be re-summarised later
+                    "param": param,
+                    "neighbour": n_df.to_dict(orient="records") if n_df is not None else [],
                 })
 
                 # clear the loader
-                placeholder.markdown(
-                    """
-                    <div style="text-align:center; margin-top:50px;">
-                        <img src="https://media0.giphy.com/media/v1.Y2lkPTc5MGI3NjExaWZ4bWczbGY1a3l6bDRkZzl6Yjd0eTJ5bTQ0MDJ1cHE1Zjgxemo1MyZlcD12MV9pbnRlcm5hbF9naWZfYnlfaWQmY3Q9Zw/6nuiJjOOQBBn2/giphy.gif" 
-                            width="150" alt="Success!">
-                        <p style="font-size:18px; color:#16a34a; font-weight:600;">Analisis selesai! Lihat tab <b>Hasil Analisis</b>.</p>
-                    </div>
-                    """,
-                    unsafe_allow_html=True
-                )
+                placeholder.markdown(SUCCESS_HTML, unsafe_allow_html=True)
 
             except Exception as e:
                 placeholder.empty()
@@ -527,12 +931,15 @@ with tab2:
         st.markdown("---")
         dc1, dc2 = st.columns(2)
         with dc1:
-            csv = df.to_csv(index=False).encode()
+            # write straight into a bytes buffer: no intermediate str + .encode() copy
+            buf = io.BytesIO()
+            df.to_csv(buf, index=False, encoding="utf-8")
+            csv = buf.getvalue()
             st.download_button("📥 Download Tabel (CSV)", csv,
                                f"similar_objects_{datetime.now():%Y%m%d_%H%M%S}.csv",
                                "text/csv", use_container_width=True)
         with dc2:
-            jsn = json.dumps(js, ensure_ascii=False, indent=2)
+            jsn = orjson.dumps(js, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
             st.download_button("📄 Download Laporan (JSON)", jsn,
                                f"analysis_report_{datetime.now():%Y%m%d_%H%M%S}.json",
                                "application/json", use_container_width=True)
@@ -550,13 +957,59 @@ with tab3:
                 st.info(item["results"]["client_sentiment"])
                 st.write("**Analisis Objek:**")
                 st.info(item["results"]["summary"])
-        if st.button("🗑️ Hapus Semua Riwayat"):
-            st.session_state.history = []
-            st.rerun()
+
+        # set before the rerun that shows the re-summarised history
+        if st.session_state.batch_notice:
+            st.warning(st.session_state.batch_notice)
+            st.session_state.batch_notice = None
+
+        hc1, hc2, hc3 = st.columns(3)
+        with hc1:
+            # non-interactive: summaries come back via the Batch API (≤ 24 jam)
+            if st.button("🔁 Hitung Ulang Semua Riwayat", disabled=st.session_state.history_batch is not None):
+                bodies = {
+                    str(i): {"model": agentic_view.SUMMARY_MODEL,
+                             "instructions": agentic_view.OBJECT_INSTRUCTIONS,
+                             "input": agentic_view.build_object_prompt(h["neighbour"], h["param"])}
+                    for i, h in enumerate(st.session_state.history) if "param" in h
+                }
+                if bodies:
+                    try:
+                        st.session_state.history_batch = run_async(batch_processor.submit(bodies))
+                    except Exception as e:
+                        st.error(f"❌ Kesalahan: {e}")
+                    else:
+                        st.rerun()
+        with hc2:
+            if st.session_state.history_batch and st.button("⏳ Cek Status Batch"):
+                try:
+                    status, results, failed = run_async(batch_processor.collect(st.session_state.history_batch))
+                except Exception as e:
+                    st.error(f"❌ Kesalahan: {e}")
+                else:
+                    if results is None:
+                        st.info(f"Batch masih diproses ({status}).")
+                    else:
+                        history = st.session_state.history
+                        for cid, summary in results.items():
+                            if summary and int(cid) < len(history):
+                                history[int(cid)]["results"] = {**history[int(cid)]["results"], "summary": summary}
+                        st.session_state.history_batch = None
+                        if status != "completed" or not results:
+                            st.error(f"❌ Batch gagal ({status}, {failed} permintaan gagal).")
+                        else:
+                            if failed:
+                                st.session_state.batch_notice = f"⚠️ {failed} riwayat gagal dihitung ulang dan tetap memakai ringkasan lama."
+                            st.rerun()
+        with hc3:
+            if st.button("🗑️ Hapus Semua Riwayat"):
+                st.session_state.history = []
+                st.session_state.history_batch = None
+                st.rerun()
     else:
         st.info("📝 Belum ada riwayat analisis.")
 
 # ----------------------------------------------------------
-# 7.  FOOTER
+# 8.  FOOTER
 # ----------------------------------------------------------
 st.divider()
\ No newline at end of file